@@ -1,19 +1,35 @@
-from typing import Literal, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Literal, Optional
 
+import asyncio
 import os
+import time
+from urllib.parse import quote, unquote, urlsplit
 
 import aiosqlite
 import httpx
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
+import orjson
+from bs4 import BeautifulSoup, Tag
+from markdownify import MarkdownConverter
 import re
-from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
 
 LANG = "ja"
 DB_PATH = os.environ.get("DB_PATH", "wikipediagpts.db")
 SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "schema.sql")
+DB_READERS = int(os.environ.get("DB_READERS", "4"))
+# /next_article でランダム記事を並行取得する件数と回数
+RANDOM_BATCH_SIZE = 6
+RANDOM_BATCHES = 2
+# /article_content のキャッシュ有効期間（秒）
+ARTICLE_CACHE_TTL = int(os.environ.get("ARTICLE_CACHE_TTL", "86400"))
+# /article_content のキャッシュ件数上限
+ARTICLE_CACHE_MAX_ROWS = int(os.environ.get("ARTICLE_CACHE_MAX_ROWS", "1000"))
+# /article_content で受け付ける本文の上限（展開後のバイト数）
+MAX_ARTICLE_BYTES = 5_000_000
 USER_AGENT = os.environ.get(
     "WIKI_USER_AGENT",
     "wikipediagpts/1.0 (+https://github.com/; contact: unknown)",
@@ -25,63 +41,210 @@ class ReactIn(BaseModel):
     reaction: Literal["like", "skip", "block"]
 
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 
-async def get_db() -> aiosqlite.Connection:
-    conn = await aiosqlite.connect(DB_PATH)
+# 書き込み用接続に設定するPRAGMA
+DB_PRAGMAS = (
+    "PRAGMA busy_timeout=3000",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA wal_autocheckpoint=1000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+)
+
+# 読み取り専用接続に設定するPRAGMA
+READER_PRAGMAS = (
+    "PRAGMA busy_timeout=3000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA query_only=1",
+)
+
+
+# 接続ごとに保持するプリペアドステートメント数
+# 接続は使い回すため、同じSQL文字列はパース・プラン済みの文がそのまま再利用される
+DB_STATEMENT_CACHE = 256
+
+
+async def _connect(pragmas: tuple[str, ...]) -> aiosqlite.Connection:
+    conn = await aiosqlite.connect(DB_PATH, cached_statements=DB_STATEMENT_CACHE)
     conn.row_factory = aiosqlite.Row
-    # スキーマ適用（存在しない場合のみ作成）
+    for pragma in pragmas:
+        await conn.execute(pragma)
+    return conn
+
+
+# schema.sql が設定するスキーマのバージョン（唯一の定義元）
+_RE_SCHEMA_VERSION = re.compile(r"^PRAGMA user_version\s*=\s*(\d+)\s*;", re.IGNORECASE | re.MULTILINE)
+
+
+async def get_db() -> aiosqlite.Connection:
+    conn = await _connect(DB_PRAGMAS)
+    # スキーマ適用（DBの user_version が schema.sql の指定より古い場合のみ）
     try:
         with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
-            await conn.executescript(f.read())
+            schema = f.read()
     except FileNotFoundError:
         # スキーマファイルが無い場合でも動作を継続
-        pass
+        return conn
+    m = _RE_SCHEMA_VERSION.search(schema)
+    if not m:
+        raise RuntimeError(f"{SCHEMA_PATH} must set PRAGMA user_version")
+
+    cur = await conn.execute("PRAGMA user_version")
+    (version,) = await cur.fetchone()
+    if version < int(m.group(1)):
+        await conn.executescript(schema)
     return conn
 
 
-async def get_or_create_user(conn: aiosqlite.Connection, handle: str) -> int:
-    await conn.execute(
-        "insert or ignore into users(handle) values(?)",
-        (handle,),
-    )
-    await conn.commit()
-    cur = await conn.execute(
-        "select id from users where handle=?",
-        (handle,),
+class ReadPool:
+    """
+    読み取り専用接続のプール。
+    WALモードでは書き込み中でも読み取りが並行できるため、書き込み用接続とは分けて持つ。
+    """
+
+    def __init__(self) -> None:
+        self._conns: list[aiosqlite.Connection] = []
+        self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+
+    async def open(self, size: int) -> None:
+        for _ in range(size):
+            conn = await _connect(READER_PRAGMAS)
+            self._conns.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def close(self) -> None:
+        for conn in self._conns:
+            await conn.close()
+        self._conns.clear()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    # 書き込み用接続は1本のみ（スキーマ適用も起動時の1回のみ）
+    app.state.db = await get_db()
+    app.state.db_lock = asyncio.Lock()
+    app.state.readers = ReadPool()
+    await app.state.readers.open(max(DB_READERS, 1))
+    # ユーザーごとの紹介済み page_id（get_seen_pages で遅延読み込み）
+    app.state.seen = {}
+    # Wikipediaへの接続はプロセス内で使い回す（TLSハンドシェイクを毎回行わない）
+    # Accept-Encoding は httpx が展開可能な形式（brotli・zstandard導入時は br・zstd を含む）から自動で付与される
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=10.0,
+        follow_redirects=True,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        headers={"User-Agent": USER_AGENT},
     )
-    row = await cur.fetchone()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await app.state.http.aclose()
+    await app.state.readers.close()
+    # 終了時に統計情報を更新しておく
+    await app.state.db.execute("PRAGMA optimize")
+    await app.state.db.close()
+
+
+@asynccontextmanager
+async def read_conn(request: Request) -> AsyncIterator[aiosqlite.Connection]:
+    async with request.app.state.readers.acquire() as conn:
+        yield conn
+
+
+@asynccontextmanager
+async def write_conn(request: Request) -> AsyncIterator[aiosqlite.Connection]:
+    # SQLiteの書き込みは単一ライターなので、アプリ側でも直列化する
+    # ブロック内の書き込みは1トランザクションとし、抜けるときに1回だけcommitする
+    async with request.app.state.db_lock:
+        conn: aiosqlite.Connection = request.app.state.db
+        try:
+            yield conn
+        except BaseException:
+            await conn.rollback()
+            raise
+        await conn.commit()
+
+
+# handle → users.id（一度作成されたら変わらないのでプロセス内で保持する）
+_uid_cache: dict[str, int] = {}
+
+
+async def get_or_create_user(request: Request, handle: str) -> int:
+    if handle in _uid_cache:
+        return _uid_cache[handle]
+
+    async with read_conn(request) as conn:
+        cur = await conn.execute(
+            "select id from users where handle=?",
+            (handle,),
+        )
+        row = await cur.fetchone()
+    if not row:
+        async with write_conn(request) as conn:
+            await conn.execute(
+                "insert or ignore into users(handle) values(?)",
+                (handle,),
+            )
+            cur = await conn.execute(
+                "select id from users where handle=?",
+                (handle,),
+            )
+            row = await cur.fetchone()
     if not row:
         raise HTTPException(status_code=500, detail="failed to get user id")
-    return int(row["id"])  # type: ignore[index]
-
 
-async def fetch_random_summary() -> dict:
-    url = "https://ja.wikipedia.org/api/rest_v1/page/random/summary"
-    async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-        r = await client.get(url)
-        r.raise_for_status()
-        return r.json()
+    uid = int(row["id"])  # type: ignore[index]
+    _uid_cache[handle] = uid
+    return uid
 
 
-def _extract_wikipedia_main_html(html: str) -> tuple[Optional[str], str]:
+async def get_seen_pages(request: Request, uid: int) -> set[int]:
     """
-    Wikipediaの記事HTMLから本体部分のHTMLを抽出する。
-    見出しタイトルと本文HTML（必要要素のみ）を返却。
+    ユーザーに紹介済みの記事の page_id 集合を返す（初回のみDBから読み込み、以降はプロセス内で保持）。
+    他プロセスでの記録は反映されないため、最終的な判定は user_articles への insert で行う。
     """
-    soup = BeautifulSoup(html, "html.parser")
+    seen: dict[int, set[int]] = request.app.state.seen
+    if uid in seen:
+        return seen[uid]
 
-    title_el = soup.select_one("#firstHeading") or soup.title
-    title = title_el.get_text(strip=True) if title_el else None
+    async with read_conn(request) as conn:
+        cur = await conn.execute(
+            """
+select a.page_id
+from user_articles ua
+join articles a on a.id = ua.article_id
+where ua.user_id=? and a.lang=?
+""",
+            (uid, LANG),
+        )
+        rows = await cur.fetchall()
+    return seen.setdefault(uid, {row["page_id"] for row in rows})
+
+
+async def fetch_random_summary(client: httpx.AsyncClient) -> dict:
+    url = "https://ja.wikipedia.org/api/rest_v1/page/random/summary"
+    r = await client.get(url)
+    r.raise_for_status()
+    return orjson.loads(r.content)
 
-    content = soup.select_one("div#mw-content-text")
-    if not content:
-        # 取得できない場合は全体HTMLを返す（フォールバック）
-        return title, html
 
-    # Wikipedia特有のノイズを削除
-    selectors_to_remove = [
+# Wikipedia特有のノイズ要素
+_NOISE_SELECTOR = ", ".join(
+    [
         "table.infobox",
         "table.vertical-navbox",
         "table.navbox",
@@ -93,51 +256,185 @@ def _extract_wikipedia_main_html(html: str) -> tuple[Optional[str], str]:
         "span.mw-editsection",
         "div.mw-kartographer-container",
         "figure[role='navigation']",
+        "sup.reference",
         "script",
         "style",
         "link",
         "noscript",
     ]
-    for selector in selectors_to_remove:
-        for el in content.select(selector):
-            el.decompose()
+)
+
+# 連続改行
+_RE_BLANKS = re.compile(r"\n{3,}")
+
 
-    for el in content.select("sup.reference"):
+def _rest_html_url(url: str) -> Optional[str]:
+    """
+    Wikipediaの記事URL（/wiki/<title>）をREST APIの本文HTML（/api/rest_v1/page/html/<title>）に変換する。
+    記事URLでなければ（クエリ付き・特別ページを含む）Noneを返す。
+    """
+    parts = urlsplit(url)
+    if not (parts.hostname or "").endswith(".wikipedia.org") or not parts.path.startswith("/wiki/"):
+        return None
+    # oldid 等のクエリ指定はREST APIに引き継げないため、元のURLを使う
+    if parts.query:
+        return None
+    title = unquote(parts.path[len("/wiki/"):])
+    # 特別ページはREST APIで取得できない
+    if not title or title.startswith(("特別:", "Special:")):
+        return None
+    return f"https://{parts.hostname}/api/rest_v1/page/html/{quote(title, safe='')}"
+
+
+def _extract_wikipedia_main_html(html: str) -> tuple[Optional[str], Tag]:
+    """
+    Wikipediaの記事HTML（デスクトップ版またはREST APIのParsoid HTML）から本体部分を抽出する。
+    見出しタイトルと本文要素（必要要素のみ）を返却。
+    要素はそのままMarkdown/テキスト変換に渡し、HTMLの再パースを避ける。
+    """
+    soup = BeautifulSoup(html, "lxml")
+
+    title_el = soup.select_one("#firstHeading") or soup.title
+    title = title_el.get_text(strip=True) if title_el else None
+
+    # REST APIのHTMLは body 直下が本文
+    content = soup.select_one("div#mw-content-text") or soup.body
+    if not content:
+        # 取得できない場合は全体を返す（フォールバック）
+        return title, soup
+
+    # Wikipedia特有のノイズを削除（1回の走査でまとめて取得）
+    # 入れ子の要素も含まれるため、子孫から先に削除する
+    for el in reversed(content.select(_NOISE_SELECTOR)):
         el.decompose()
 
-    # 一部の空要素や冗長な改行を減らすためにクリーンアップ
-    # ここではHTML文字列に戻すだけに留める
-    return title, str(content)
+    # 削除で分断された隣接テキストノードを結合しておく
+    content.smooth()
+    return title, content
 
 
-def _html_to_markdown(html: str) -> str:
-    markdown = md(html, heading_style="ATX")
+# markdownify の変換器（設定は固定なので使い回す）
+_MARKDOWN_CONVERTER = MarkdownConverter(heading_style="ATX")
+
+
+def _html_to_markdown(content: Tag) -> str:
+    markdown = _MARKDOWN_CONVERTER.convert_soup(content)
     # 連続改行の正規化
-    markdown = re.sub(r"\n{3,}", "\n\n", markdown)
+    markdown = _RE_BLANKS.sub("\n\n", markdown)
     return markdown.strip()
 
 
-def _html_to_text(html: str) -> str:
-    soup = BeautifulSoup(html, "html.parser")
-    text = soup.get_text(separator="\n")
-    text = re.sub(r"\n{3,}", "\n\n", text)
+def _html_to_text(content: Tag) -> str:
+    text = content.get_text(separator="\n")
+    text = _RE_BLANKS.sub("\n\n", text)
     # 行末の余計な空白を削除
     text = "\n".join(line.rstrip() for line in text.splitlines())
     return text.strip()
 
 
+def _render_article(html: str, format: str) -> tuple[Optional[str], str]:
+    title, main = _extract_wikipedia_main_html(html)
+    if format == "markdown":
+        return title, _html_to_markdown(main)
+    return title, _html_to_text(main)
+
+
+async def _read_capped(r: httpx.Response) -> bytes:
+    """
+    レスポンス本文をストリームで読み込む（展開後 MAX_ARTICLE_BYTES を超えたら打ち切る）。
+    """
+    try:
+        length = int(r.headers.get("content-length", "0"))
+    except ValueError:
+        # 不正な Content-Length は無視し、読み込み中の上限チェックに任せる
+        length = 0
+    if length > MAX_ARTICLE_BYTES:
+        raise HTTPException(status_code=502, detail="article too large")
+    body = bytearray()
+    async for chunk in r.aiter_bytes():
+        body += chunk
+        if len(body) > MAX_ARTICLE_BYTES:
+            raise HTTPException(status_code=502, detail="article too large")
+    return bytes(body)
+
+
+def _article_response(title: Optional[str], url: str, format: str, content: str) -> dict:
+    return {
+        "title": title,
+        "url": url,
+        "format": format,
+        "content": content,
+    }
+
+
+def _next_article_response(
+    article_id: int,
+    title: str,
+    url: str,
+    extract: Optional[str],
+    thumbnail: Optional[str],
+) -> dict:
+    return {
+        "article_id": article_id,
+        "title": title,
+        "url": url,
+        "summary": {
+            "extract": extract,
+            "thumbnail": thumbnail,
+        },
+    }
+
+
 @app.get("/health")
 async def health():
     return {"ok": True}
 
 
 @app.get("/next_article")
-async def next_article(user: str = Query(alias="user")):
-    conn = await get_db()
-    try:
-        uid = await get_or_create_user(conn, user)
-        for _ in range(12):
-            js = await fetch_random_summary()
+async def next_article(request: Request, user: str = Query(alias="user")):
+    uid = await get_or_create_user(request, user)
+    seen = await get_seen_pages(request, uid)
+
+    # 取得済みの記事に未紹介のものがあれば、Wikipediaに問い合わせずそこから選ぶ
+    async with read_conn(request) as conn:
+        cur = await conn.execute(
+            """
+select a.id, a.page_id, a.title, a.url, s.extract, s.thumbnail
+from articles a
+join article_summaries s on s.article_id = a.id
+where a.lang=?
+and not exists (select 1 from user_articles ua where ua.user_id=? and ua.article_id=a.id)
+order by random()
+limit 1
+""",
+            (LANG, uid),
+        )
+        ar = await cur.fetchone()
+    if ar:
+        async with write_conn(request) as conn:
+            cur = await conn.execute(
+                "insert or ignore into user_articles(user_id, article_id) values(?,?)",
+                (uid, ar["id"]),
+            )
+            inserted = cur.rowcount == 1
+        seen.add(ar["page_id"])
+        if inserted:
+            return _next_article_response(ar["id"], ar["title"], ar["url"], ar["extract"], ar["thumbnail"])
+
+    client: httpx.AsyncClient = request.app.state.http
+    for _ in range(RANDOM_BATCHES):
+        # ランダム記事はまとめて並行取得し、未紹介の最初の1件を採用する
+        results = await asyncio.gather(
+            *(fetch_random_summary(client) for _ in range(RANDOM_BATCH_SIZE)),
+            return_exceptions=True,
+        )
+        if all(isinstance(js, BaseException) for js in results):
+            raise HTTPException(status_code=502, detail="failed to fetch random article")
+
+        candidates = []
+        for js in results:
+            if isinstance(js, BaseException):
+                continue
 
             # 除外: あいまいさ回避・標準以外
             if js.get("type") not in (None, "standard"):
@@ -149,85 +446,150 @@ async def next_article(user: str = Query(alias="user")):
             if not (pageid and title and url):
                 continue
 
-            # articles upsert
-            await conn.execute(
-                "insert or ignore into articles(lang, page_id, title, url) values(?,?,?,?)",
-                (LANG, pageid, title, url),
-            )
-            await conn.commit()
-
-            cur = await conn.execute(
-                "select id from articles where lang=? and page_id=?",
-                (LANG, pageid),
-            )
-            ar = await cur.fetchone()
-            if not ar:
+            # 既紹介と分かっている記事はDBに問い合わせず除外
+            if pageid in seen:
                 continue
-            article_id = ar["id"]
 
-            # 既紹介？
-            cur = await conn.execute(
-                "select 1 from user_articles where user_id=? and article_id=?",
-                (uid, article_id),
-            )
-            if await cur.fetchone():
-                continue
+            candidates.append((pageid, title, url, js))
+
+        # 候補はすべて articles に取り込み（次回以降はDBから選べる）、
+        # 未紹介の最初の1件をその場で記録する。すべて1トランザクションで行う
+        picked = None
+        async with write_conn(request) as conn:
+            for pageid, title, url, js in candidates:
+                extract = js.get("extract")
+                thumbnail = (js.get("thumbnail") or {}).get("source")
+                cur = await conn.execute(
+                    """
+insert into articles(lang, page_id, title, url) values(?,?,?,?)
+on conflict(lang, page_id) do update set title=excluded.title, url=excluded.url
+returning id
+""",
+                    (LANG, pageid, title, url),
+                )
+                ar = await cur.fetchone()
+                article_id = ar["id"]
+                await conn.execute(
+                    """
+insert into article_summaries(article_id, extract, thumbnail) values(?,?,?)
+on conflict(article_id) do update set extract=excluded.extract, thumbnail=excluded.thumbnail
+""",
+                    (article_id, extract, thumbnail),
+                )
+                if picked:
+                    continue
 
-            # 未紹介なら即時記録
-            await conn.execute(
-                "insert into user_articles(user_id, article_id) values(?,?)",
-                (uid, article_id),
-            )
-            await conn.commit()
+                # （既紹介なら insert or ignore で何も挿入されない）
+                cur = await conn.execute(
+                    "insert or ignore into user_articles(user_id, article_id) values(?,?)",
+                    (uid, article_id),
+                )
+                seen.add(pageid)
+                if cur.rowcount == 1:
+                    picked = _next_article_response(article_id, title, url, extract, thumbnail)
 
-            return {
-                "article_id": article_id,
-                "title": title,
-                "url": url,
-                "summary": {
-                    "extract": js.get("extract"),
-                    "thumbnail": (js.get("thumbnail") or {}).get("source"),
-                },
-            }
+        if picked:
+            return picked
 
-        raise HTTPException(status_code=404, detail="No unseen article found (try again)")
-    finally:
-        await conn.close()
+    raise HTTPException(status_code=404, detail="No unseen article found (try again)")
 
 
 @app.get("/article_content")
 async def article_content(
+    request: Request,
     url: str = Query(alias="url"),
     format: Literal["markdown", "text"] = Query("markdown", alias="format"),
 ):
     """指定URL（Wikipedia想定）をサーバ側で取得し、本文をMarkdown/テキストに正規化して返す。"""
-    headers = {"User-Agent": USER_AGENT}
-    async with httpx.AsyncClient(timeout=15.0, follow_redirects=True, headers=headers) as client:
-        try:
-            r = await client.get(url)
-            r.raise_for_status()
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=502, detail=f"failed to fetch url: {e}")
+    async with read_conn(request) as conn:
+        cur = await conn.execute(
+            """
+select title, resolved_url, content, etag, last_modified, fetched_at
+from article_cache
+where url=? and format=?
+""",
+            (url, format),
+        )
+        cached = await cur.fetchone()
 
-    title, main_html = _extract_wikipedia_main_html(r.text)
-    if format == "markdown":
-        content = _html_to_markdown(main_html)
-    else:
-        content = _html_to_text(main_html)
+    now = int(time.time())
+    if cached and now - cached["fetched_at"] < ARTICLE_CACHE_TTL:
+        return _article_response(cached["title"], cached["resolved_url"], format, cached["content"])
 
-    return {
-        "title": title,
-        "url": str(r.url),
-        "format": format,
-        "content": content,
-    }
+    # 期限切れのキャッシュがあれば条件付きリクエストで更新有無を確認する
+    headers = {}
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached["last_modified"]:
+        headers["If-Modified-Since"] = cached["last_modified"]
 
+    # 記事URLならナビゲーション等を含まないREST APIの本文HTMLを取得する
+    rest_url = _rest_html_url(url)
 
-@app.post("/react")
-async def react(inp: ReactIn, user: str = Query(alias="user")):
-    conn = await get_db()
+    client: httpx.AsyncClient = request.app.state.http
     try:
-        uid = await get_or_create_user(conn, user)
+        async with client.stream("GET", rest_url or url, headers=headers, timeout=15.0) as r:
+            if not (cached and r.status_code == 304):
+                r.raise_for_status()
+            body = await _read_capped(r)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"failed to fetch url: {e}")
+
+    if cached and r.status_code == 304:
+        async with write_conn(request) as conn:
+            await conn.execute(
+                "update article_cache set fetched_at=? where url=? and format=?",
+                (now, url, format),
+            )
+        return _article_response(cached["title"], cached["resolved_url"], format, cached["content"])
+
+    # パースと変換はCPUを使うため、イベントループを塞がないようスレッドで実行する
+    html = body.decode(r.encoding or "utf-8", errors="replace")
+    title, content = await asyncio.to_thread(_render_article, html, format)
+    page_url = url if rest_url else str(r.url)
+
+    async with write_conn(request) as conn:
+        await conn.execute(
+            """
+insert into article_cache(url, format, title, resolved_url, content, etag, last_modified, fetched_at)
+values(?,?,?,?,?,?,?,?)
+on conflict(url, format) do update set
+title=excluded.title,
+resolved_url=excluded.resolved_url,
+content=excluded.content,
+etag=excluded.etag,
+last_modified=excluded.last_modified,
+fetched_at=excluded.fetched_at
+""",
+            (
+                url,
+                format,
+                title,
+                page_url,
+                content,
+                r.headers.get("etag"),
+                r.headers.get("last-modified"),
+                now,
+            ),
+        )
+        # 件数上限を超えた分は取得日時の古いものから削除する
+        await conn.execute(
+            """
+delete from article_cache
+where rowid in (
+select rowid from article_cache order by fetched_at desc limit -1 offset ?
+)
+""",
+            (ARTICLE_CACHE_MAX_ROWS,),
+        )
+
+    return _article_response(title, page_url, format, content)
+
+
+@app.post("/react")
+async def react(request: Request, inp: ReactIn, user: str = Query(alias="user")):
+    uid = await get_or_create_user(request, user)
+    async with write_conn(request) as conn:
         await conn.execute(
             """
 update user_articles
@@ -236,7 +598,4 @@ where user_id=? and article_id=?
 """,
             (inp.reaction, uid, inp.article_id),
         )
-        await conn.commit()
-        return {"ok": True}
-    finally:
-        await conn.close()
\ No newline at end of file
+    return {"ok": True}
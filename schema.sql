@@ -31,5 +31,35 @@ foreign key(article_id) references articles(id)
 );
 
 
-create index if not exists idx_user_articles_user on user_articles(user_id);
-create index if not exists idx_articles_lang_page on articles(lang, page_id);
\ No newline at end of file
+-- /next_article で取得した記事の要約（取得済み記事から再紹介する際に使う）
+create table if not exists article_summaries(
+article_id integer primary key,
+extract text,
+thumbnail text,
+foreign key(article_id) references articles(id)
+);
+
+
+-- /article_content の変換結果キャッシュ
+create table if not exists article_cache(
+url text not null,
+format text not null, -- 'markdown'|'text'
+title text,
+resolved_url text not null,
+content text not null,
+etag text,
+last_modified text,
+fetched_at integer not null, -- unixtime
+primary key(url, format)
+);
+create index if not exists idx_article_cache_fetched on article_cache(fetched_at);
+
+
+-- primary key(user_id, article_id) / unique(lang, page_id) の自動インデックスと重複するため削除
+-- （既紹介チェックや upsert はいずれも自動インデックスの探索で済む）
+drop index if exists idx_user_articles_user;
+drop index if exists idx_articles_lang_page;
+
+
+-- スキーマを変更したら上げる（app.py はこの値を読んで適用要否を判断する）
+PRAGMA user_version=4;
\ No newline at end of file
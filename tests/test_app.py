@@ -1,6 +1,39 @@
+import sqlite3
+
+import httpx
 import pytest
+from fastapi.testclient import TestClient
 from httpx import AsyncClient
-from app import app
+from app import (
+    _extract_wikipedia_main_html,
+    _html_to_markdown,
+    _html_to_text,
+    _rest_html_url,
+    app,
+)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setattr("app.DB_PATH", db_path)
+    monkeypatch.setattr("app._uid_cache", {})
+    with TestClient(app) as c:
+        c.db_path = db_path
+        yield c
+
+
+def _mock_wikipedia(client, handler) -> list[httpx.Request]:
+    """app.state.http を MockTransport に差し替え、送られたリクエストを記録する。"""
+    calls: list[httpx.Request] = []
+
+    def record(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return handler(request)
+
+    client.portal.call(client.app.state.http.aclose)
+    client.app.state.http = httpx.AsyncClient(transport=httpx.MockTransport(record))
+    return calls
 
 
 @pytest.mark.asyncio
@@ -8,4 +41,145 @@ async def test_health():
     async with AsyncClient(app=app, base_url="http://test") as ac:
         r = await ac.get("/health")
         assert r.status_code == 200
-        assert r.json().get("ok") is True
\ No newline at end of file
+        assert r.json().get("ok") is True
+
+
+def test_article_conversion_strips_wikipedia_noise():
+    html = """
+<html><head><title>東京 - Wikipedia</title></head><body>
+<h1 id="firstHeading">東京</h1>
+<div id="mw-content-text">
+<table class="infobox"><tr><td>info</td></tr></table>
+<p>東京は<b>日本</b>の首都<sup class="reference">[1]</sup>である。</p>
+<h2>歴史<span class="mw-editsection">[編集]</span></h2>
+<script>alert(1)</script>
+</div>
+</body></html>
+"""
+    title, main = _extract_wikipedia_main_html(html)
+    assert title == "東京"
+    assert _html_to_markdown(main) == "東京は**日本**の首都である。\n\n## 歴史"
+    assert _html_to_text(main) == "東京は\n日本\nの首都である。\n\n歴史"
+
+
+def test_rest_html_url():
+    assert (
+        _rest_html_url("https://ja.wikipedia.org/wiki/%E6%9D%B1%E4%BA%AC")
+        == "https://ja.wikipedia.org/api/rest_v1/page/html/%E6%9D%B1%E4%BA%AC"
+    )
+    assert (
+        _rest_html_url("https://ja.wikipedia.org/wiki/AC/DC")
+        == "https://ja.wikipedia.org/api/rest_v1/page/html/AC%2FDC"
+    )
+    assert _rest_html_url("https://example.com/wiki/Foo") is None
+    assert _rest_html_url("https://ja.wikipedia.org/w/index.php?title=Foo") is None
+    assert _rest_html_url("https://ja.wikipedia.org/wiki/%E6%9D%B1%E4%BA%AC?oldid=12345") is None
+    assert (
+        _rest_html_url(
+            "https://ja.wikipedia.org/wiki/%E7%89%B9%E5%88%A5:%E3%81%8A%E3%81%BE%E3%81%8B%E3%81%9B%E8%A1%A8%E7%A4%BA"
+        )
+        is None
+    )
+    assert _rest_html_url("https://en.wikipedia.org/wiki/Special:Random") is None
+
+
+def test_article_content_cache_hit_and_revalidation(client):
+    page = '<html><head><title>東京</title></head><body><p>東京は首都。</p></body></html>'
+
+    def handler(request):
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, html=page, headers={"etag": '"v1"'})
+
+    calls = _mock_wikipedia(client, handler)
+    params = {"url": "https://ja.wikipedia.org/wiki/%E6%9D%B1%E4%BA%AC", "format": "text"}
+    expected = {
+        "title": "東京",
+        "url": params["url"],
+        "format": "text",
+        "content": "東京は首都。",
+    }
+
+    # 未キャッシュ → 取得して保存
+    assert client.get("/article_content", params=params).json() == expected
+    assert len(calls) == 1
+
+    # 有効期間内 → 取得しない
+    assert client.get("/article_content", params=params).json() == expected
+    assert len(calls) == 1
+
+    # 期限切れ → 条件付きリクエストの304でキャッシュを返し、fetched_at を更新
+    with sqlite3.connect(client.db_path) as db:
+        db.execute("update article_cache set fetched_at=0")
+    assert client.get("/article_content", params=params).json() == expected
+    assert len(calls) == 2
+    assert calls[1].headers["if-none-match"] == '"v1"'
+    with sqlite3.connect(client.db_path) as db:
+        (fetched_at,) = db.execute("select fetched_at from article_cache").fetchone()
+    assert fetched_at > 0
+
+
+def test_next_article_serves_stored_articles_before_fetching(client):
+    page_ids = iter(range(1, 1000))
+
+    def handler(request):
+        n = next(page_ids)
+        return httpx.Response(
+            200,
+            json={
+                "type": "standard",
+                "pageid": n,
+                "title": f"記事{n}",
+                "extract": f"要約{n}",
+                "content_urls": {"desktop": {"page": f"https://ja.wikipedia.org/wiki/{n}"}},
+            },
+        )
+
+    calls = _mock_wikipedia(client, handler)
+
+    # 初回は1バッチ分を取得し、全件を取り込んだうえで1件を返す
+    r = client.get("/next_article", params={"user": "a"})
+    assert r.status_code == 200
+    assert len(calls) == 6
+    seen_a = {r.json()["article_id"]}
+
+    # 別ユーザーは取り込み済みの記事から返され、Wikipediaには問い合わせない
+    r = client.get("/next_article", params={"user": "b"})
+    assert r.status_code == 200
+    assert r.json()["summary"]["extract"].startswith("要約")
+    assert len(calls) == 6
+
+    # 取り込み済みの残り5件は重複なく返される
+    for _ in range(5):
+        r = client.get("/next_article", params={"user": "a"})
+        assert r.status_code == 200
+        assert r.json()["article_id"] not in seen_a
+        seen_a.add(r.json()["article_id"])
+    assert len(calls) == 6
+
+    # 取り込み済みの記事を使い切ったら再び取得する
+    r = client.get("/next_article", params={"user": "a"})
+    assert r.status_code == 200
+    assert r.json()["article_id"] not in seen_a
+    assert len(calls) == 12
+
+
+def test_article_content_size_cap(client, monkeypatch):
+    monkeypatch.setattr("app.MAX_ARTICLE_BYTES", 1000)
+    page = b"<html><body><p>short</p></body></html>"
+
+    def handler(request):
+        if request.url.path.endswith("/Large"):
+            return httpx.Response(200, content=b"<p>" + b"x" * 2000 + b"</p>")
+        return httpx.Response(200, content=page, headers={"content-length": "abc"})
+
+    _mock_wikipedia(client, handler)
+
+    # 上限超過は502
+    r = client.get("/article_content", params={"url": "https://ja.wikipedia.org/wiki/Large"})
+    assert r.status_code == 502
+
+    # 不正な Content-Length は無視して読み込む
+    r = client.get("/article_content", params={"url": "https://ja.wikipedia.org/wiki/Small", "format": "text"})
+    assert r.status_code == 200
+    assert r.json()["content"] == "short"